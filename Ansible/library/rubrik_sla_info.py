@@ -0,0 +1,121 @@
+#!/usr/bin/python
+# MIT License (see https://opensource.org/licenses/MIT)
+
+DOCUMENTATION = r'''
+---
+module: rubrik_sla_info
+short_description: Retrieve Rubrik Security Cloud SLA domains and their snapshot schedules
+description:
+  - Authenticates with Rubrik Security Cloud (RSC), pages through all SLA domains in a single
+    module invocation over one pooled HTTP session and returns them as facts.
+  - The facts are set as C(rubrik_sla_domains), so they can be reused by later plays and, with
+    fact caching enabled, by later playbook runs.
+options:
+  env_name:
+    description: RSC environment name, e.g. C(rscetf) for C(rscetf.my.rubrik.com).
+    type: str
+    required: true
+  client_id:
+    description: RSC service account client ID. Defaults to the C(RUBRIK_CLIENT_ID) environment variable.
+    type: str
+  client_secret:
+    description: RSC service account client secret. Defaults to the C(RUBRIK_CLIENT_SECRET) environment variable.
+    type: str
+  page_size:
+    description: Number of SLA domains requested per page. Uses the RSC default when omitted.
+    type: int
+  timeout:
+    description: Timeout in seconds for every API call.
+    type: int
+    default: 120
+  validate_certs:
+    description: Whether to validate the RSC TLS certificate.
+    type: bool
+    default: true
+requirements:
+  - requests
+'''
+
+EXAMPLES = r'''
+- name: Get SLA domains from RSC
+  rubrik_sla_info:
+    env_name: rscetf
+  register: sla_info
+
+- name: Print SLA domain names
+  ansible.builtin.debug:
+    msg: "{{ rubrik_sla_domains | map(attribute='name') | list }}"
+'''
+
+RETURN = r'''
+sla_domains:
+  description: All SLA domains with their id, name and snapshotSchedule.
+  returned: success
+  type: list
+  elements: dict
+api_calls:
+  description: Number of HTTP calls made to RSC, including authentication and logout.
+  returned: success
+  type: int
+ansible_facts:
+  description: Facts set by the module.
+  returned: success
+  type: dict
+  contains:
+    rubrik_sla_domains:
+      description: Same as I(sla_domains).
+      type: list
+      elements: dict
+'''
+
+from ansible.module_utils.basic import AnsibleModule, env_fallback, missing_required_lib
+from ansible.module_utils.rubrik_rsc import RubrikClient, HAS_REQUESTS, REQUESTS_IMPORT_ERROR
+
+
+def main():
+    module = AnsibleModule(
+        argument_spec=dict(
+            env_name=dict(type='str', required=True),
+            client_id=dict(type='str', fallback=(env_fallback, ['RUBRIK_CLIENT_ID'])),
+            client_secret=dict(type='str', no_log=True, fallback=(env_fallback, ['RUBRIK_CLIENT_SECRET'])),
+            page_size=dict(type='int'),
+            timeout=dict(type='int', default=120),
+            validate_certs=dict(type='bool', default=True),
+        ),
+        supports_check_mode=True,
+    )
+
+    if not HAS_REQUESTS:
+        module.fail_json(msg=missing_required_lib('requests'), exception=REQUESTS_IMPORT_ERROR)
+    if not module.params['client_id'] or not module.params['client_secret']:
+        module.fail_json(msg="client_id and client_secret are required, either as options or as the RUBRIK_CLIENT_ID and RUBRIK_CLIENT_SECRET environment variables.")
+
+    client = None
+    try:
+        client = RubrikClient(
+            client_id=module.params['client_id'],
+            client_secret=module.params['client_secret'],
+            env_name=module.params['env_name'],
+            timeout=module.params['timeout'],
+            validate_certs=module.params['validate_certs'],
+        )
+        sladomains = client._get_sla_domains(page_size=module.params['page_size'])
+        client._delete_session()
+    except Exception as e:
+        if client is not None:
+            try:
+                client._delete_session()
+            except Exception:
+                pass
+        module.fail_json(msg=str(e))
+
+    module.exit_json(
+        changed=False,
+        sla_domains=sladomains,
+        api_calls=client.api_calls,
+        ansible_facts=dict(rubrik_sla_domains=sladomains),
+    )
+
+
+if __name__ == '__main__':
+    main()
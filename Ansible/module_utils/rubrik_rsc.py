@@ -0,0 +1,157 @@
+# Shared RSC client for the Rubrik Ansible modules in this directory.
+# Mirrors the RubrikClient and Queries classes of Python/rubrik_get_sla_details.py, but keeps a
+# single pooled requests.Session per module invocation and reports errors instead of printing.
+
+import traceback
+
+try:
+    import requests
+    HAS_REQUESTS = True
+    REQUESTS_IMPORT_ERROR = None
+except ImportError:
+    HAS_REQUESTS = False
+    REQUESTS_IMPORT_ERROR = traceback.format_exc()
+
+
+# A class to define the GraphQL queries
+class Queries():
+    @staticmethod
+    def get_sla_domains(after_cursor=None, first=None):
+        """Get SLA domains with pagination support."""
+        query = """
+            query GetSlaDomains($after: String, $first: Int) {
+                slaDomains (after: $after, first: $first) {
+                    pageInfo {
+                        endCursor
+                        hasNextPage
+                    }
+                    edges {
+                        node {
+                            ... on GlobalSlaReply {
+                                name
+                                id
+                                snapshotSchedule {
+                                    hourly {
+                                        basicSchedule {
+                                            frequency
+                                            retention
+                                            retentionUnit
+                                        }
+                                    }
+                                    daily {
+                                        basicSchedule {
+                                            frequency
+                                            retention
+                                            retentionUnit
+                                        }
+                                    }
+                                    weekly {
+                                        basicSchedule {
+                                            frequency
+                                            retention
+                                            retentionUnit
+                                        }
+                                    }
+                                    monthly {
+                                        basicSchedule {
+                                            frequency
+                                            retention
+                                            retentionUnit
+                                        }
+                                    }
+                                    yearly {
+                                        basicSchedule {
+                                            frequency
+                                            retention
+                                            retentionUnit
+                                        }
+                                    }
+                                }
+                            }
+                        }
+                    }
+                }
+            }
+        """
+
+        variables = {}
+        if after_cursor is not None:
+            variables["after"] = after_cursor
+        if first is not None:
+            variables["first"] = first
+
+        return dict(
+            query=query,
+            variables=variables or None
+        )
+
+
+# A class to connect and send requests to the Rubrik API (RSC) over one pooled session
+class RubrikClient:
+    def __init__(self, client_id, client_secret, env_name, timeout=120, validate_certs=True):
+        self.base_url = f"https://{env_name}.my.rubrik.com"
+        self.token = None
+        self.client_id = client_id
+        self.client_secret = client_secret
+        self.timeout = timeout
+        self.session = requests.Session()
+        self.session.verify = validate_certs
+        self.session.headers.update({'Content-Type': 'application/json'})
+        self.api_calls = 0
+        self._authenticate()
+
+    def _authenticate(self):
+        """Authenticate with the Rubrik API using client credentials."""
+        url = f"{self.base_url}/api/client_token"
+        payload = {
+            "client_id": self.client_id,
+            "client_secret": self.client_secret
+        }
+        response = self.session.post(url, json=payload, timeout=self.timeout)
+        self.api_calls += 1
+        if response.status_code == 200:
+            self.token = response.json().get('access_token')
+            self.session.headers['Authorization'] = f"Bearer {self.token}"
+        else:
+            raise Exception(f"Authentication failed: {response.text}")
+
+    def _delete_session(self):
+        """Delete the current session and close the pooled connections."""
+        try:
+            if self.token:
+                url = f"{self.base_url}/api/session"
+                response = self.session.delete(url, timeout=self.timeout)
+                self.api_calls += 1
+                if response.status_code not in [200, 204]:
+                    raise Exception(f"Failed to delete session: {response.text}")
+                self.token = None
+        finally:
+            self.session.close()
+
+    def _send_graphql_call(self, payload):
+        """Send a GraphQL call to the Rubrik API and return the JSON response."""
+        url = f"{self.base_url}/api/graphql"
+        response = self.session.post(url, json=payload, timeout=self.timeout)
+        self.api_calls += 1
+        if not response.ok:
+            raise Exception(f"GraphQL query failed: {response.text}")
+        body = response.json()
+        if body.get("errors"):
+            raise Exception(f"GraphQL query failed: {body['errors'][0].get('message')}")
+        return body
+
+    def _get_sla_domains(self, page_size=None):
+        """Retrieve all SLA domain nodes with pagination support."""
+        after_cursor = None
+        hasnextpage = True
+        sladomains = []
+
+        while hasnextpage:
+            slaDomains_payload = Queries.get_sla_domains(after_cursor=after_cursor, first=page_size)
+            response = self._send_graphql_call(payload=slaDomains_payload)
+            sladomains_page = response.get("data", {}).get("slaDomains", {})
+            sladomains.extend(edge["node"] for edge in sladomains_page.get("edges", []))
+            pageInfo = sladomains_page.get("pageInfo", {})
+            hasnextpage = pageInfo.get("hasNextPage", False)
+            after_cursor = pageInfo.get("endCursor", None)
+        return sladomains
@@ -1,6 +1,7 @@
 import requests
 import os
 import argparse
+import time
 import json
 from typing import List
 
@@ -152,14 +153,56 @@ class QueriesAndMutations():
             variables=variables
         )
 
+# Default (connect, read) timeouts in seconds for every type of API call
+DEFAULT_TIMEOUTS = {
+    "authenticate": (10, 30),
+    "graphql": (10, 120),
+    "delete_session": (10, 30)
+}
+
+
+# An exception raised when the overall deadline of a run has passed
+class DeadlineExceeded(Exception):
+    def __init__(self, message, partial_result=None):
+        super().__init__(message)
+        self.partial_result = partial_result
+
+
+# A class tracking the remaining time budget of a run
+class Deadline:
+    def __init__(self, seconds: float = None):
+        self.expires_at = time.monotonic() + seconds if seconds is not None else None
+
+    def remaining(self):
+        """Return the remaining seconds, or None if there is no deadline."""
+        if self.expires_at is None:
+            return None
+        return max(0.0, self.expires_at - time.monotonic())
+
+    def check(self, step: str):
+        """Raise DeadlineExceeded if the deadline has passed before the given step."""
+        if self.remaining() == 0:
+            raise DeadlineExceeded(f"Deadline exceeded before {step}.")
+
+    def timeout(self, timeout: tuple, step: str):
+        """Return a (connect, read) timeout capped to the remaining budget."""
+        self.check(step)
+        remaining = self.remaining()
+        if remaining is None:
+            return timeout
+        return tuple(min(value, remaining) for value in timeout)
+
+
 # A class to connect and send requests to the Rubrik API (RSC)
 class RubrikClient:
-    def __init__(self, client_id=None, client_secret=None, env_name=None):
+    def __init__(self, client_id=None, client_secret=None, env_name=None, timeouts: dict = None, deadline: Deadline = None):
         self.base_url = f"https://{env_name}.my.rubrik.com"
         self.token = None
         self.client_id = client_id if client_id else os.getenv('RUBRIK_CLIENT_ID')
         self.client_secret = client_secret if client_secret else os.getenv('RUBRIK_CLIENT_SECRET')
         self.headers = {'Content-Type': 'application/json'}
+        self.timeouts = {**DEFAULT_TIMEOUTS, **(timeouts or {})}
+        self.deadline = deadline if deadline else Deadline()
         self._authenticate()
 
 
@@ -170,7 +213,7 @@ class RubrikClient:
             "client_id": self.client_id,
             "client_secret": self.client_secret
         }
-        response = requests.post(url, json=payload, headers=self.headers)
+        response = requests.post(url, json=payload, headers=self.headers, timeout=self.deadline.timeout(self.timeouts["authenticate"], step="authentication"))
         if response.status_code == 200:
             self.token = response.json().get('access_token')
             self.headers['Authorization'] = f"Bearer {self.token}"
@@ -183,7 +226,8 @@ class RubrikClient:
         """Delete the current session."""
         if self.token:
             url = f"{self.base_url}/api/session"
-            response = requests.delete(url, headers=self.headers)
+            # Not capped by the deadline so the session is still cleaned up after it has passed
+            response = requests.delete(url, headers=self.headers, timeout=self.timeouts["delete_session"])
             if response.status_code in [200, 204]:
                 print("Session deleted successfully.")
                 self.token = None
@@ -197,7 +241,11 @@ class RubrikClient:
     def _send_graphql_call(self, payload):
         """Send a GraphQL call to the Rubrik API and return the JSON response."""
         url = f"{self.base_url}/api/graphql"
-        response = requests.post(url, json=payload, headers=self.headers)
+        try:
+            response = requests.post(url, json=payload, headers=self.headers, timeout=self.deadline.timeout(self.timeouts["graphql"], step="the GraphQL call"))
+        except requests.Timeout as e:
+            self.deadline.check("the GraphQL call completed")
+            raise Exception(f"GraphQL query timed out: {e}")
         if response.ok:
             return response.json()
         else:
@@ -243,12 +291,24 @@ if __name__ == "__main__":
     parser.add_argument("--aws_regions", nargs='+', help="Space-separated list of AWS regions to protect (e.g., 'EU_WEST_2 US_EAST_1').", required=True)
     parser.add_argument("--cross_account_role_arn", help="The AWS Cross-Account Role ARN obtained after deploying the CloudFormation template. This is required to complete the process.", default=None)
 
+    # Timeouts and overall deadline
+    parser.add_argument("--auth_timeout", help="Connect and read timeouts in seconds for authentication.", nargs=2, type=float, metavar=("CONNECT", "READ"), default=DEFAULT_TIMEOUTS["authenticate"])
+    parser.add_argument("--graphql_timeout", help="Connect and read timeouts in seconds for each GraphQL call.", nargs=2, type=float, metavar=("CONNECT", "READ"), default=DEFAULT_TIMEOUTS["graphql"])
+    parser.add_argument("--session_timeout", help="Connect and read timeouts in seconds for deleting the session.", nargs=2, type=float, metavar=("CONNECT", "READ"), default=DEFAULT_TIMEOUTS["delete_session"])
+    parser.add_argument("--deadline", help="Overall time budget for the run in seconds. Once exceeded, outstanding work is abandoned and partial results are reported.", type=float, default=None)
 
     args = parser.parse_args()
 
     # Initialize Rubrik Client
-    client = RubrikClient(client_id=args.client_id, client_secret=args.client_secret, env_name=args.env_name)
+    timeouts = {
+        "authenticate": tuple(args.auth_timeout),
+        "graphql": tuple(args.graphql_timeout),
+        "delete_session": tuple(args.session_timeout)
+    }
+    client = RubrikClient(client_id=args.client_id, client_secret=args.client_secret, env_name=args.env_name,
+                          timeouts=timeouts, deadline=Deadline(args.deadline))
 
+    completed_steps = []
     try:
         # --- Step 1: Validate and Initiate AWS Cloud Account ---
         print("\n--- Step 1: Validating and Initiating AWS Cloud Account Creation ---")
@@ -265,6 +325,7 @@ if __name__ == "__main__":
             print(f"CloudFormation Console URL: {cloud_formation_url}")
             print(f"CloudFormation Template URL: {template_url}")
             print(f"Suggested Stack Name: {stack_name}")
+            completed_steps.append("Step 1: Validate and initiate")
             print("\n!!! IMPORTANT: Please download the template from the 'CloudFormation Template URL' above.")
             print("!!! Deploy this template in your AWS account via CloudFormation.")
             print("!!! Once deployed, copy the 'CrossAccountRoleARN' from the CloudFormation stack outputs.")
@@ -282,6 +343,7 @@ if __name__ == "__main__":
             exit(1)
 
         # --- Step 2: Finalize AWS Cloud Account Protection (Specify Regions) ---
+        client.deadline.check("Step 2")
         print("\n--- Step 2: Finalizing AWS Cloud Account Protection (Specifying Regions) ---")
         finalize_response = client.finalize_aws_account_protection(
             aws_native_id=args.aws_account_id,
@@ -291,6 +353,7 @@ if __name__ == "__main__":
 
         if finalize_response:
             print(f"Protection finalization initiated for regions: {', '.join(args.aws_regions)}")
+            completed_steps.append("Step 2: Finalize protection")
         else:
             print("Failed to finalize AWS cloud account protection. Check regions or account details.")
             client._delete_session()
@@ -298,6 +361,7 @@ if __name__ == "__main__":
 
         # --- Step 3: Register AWS Account Feature Artifacts (Cross-Account Role ARN) ---
         # This step is only executed if the Cross-Account Role ARN is provided
+        client.deadline.check("Step 3")
         print("\n--- Step 3: Registering AWS Account Feature Artifacts (Cross-Account Role ARN) ---")
         register_response = client.register_aws_feature_artifacts(
             aws_native_id=args.aws_account_id,
@@ -306,12 +370,18 @@ if __name__ == "__main__":
 
         if register_response:
             print("AWS Cross-Account Role ARN registered successfully.")
+            completed_steps.append("Step 3: Register Cross-Account Role ARN")
             print("AWS Cloud Account integration complete. RSC will now discover resources.")
         else:
             print("Failed to register AWS Cross-Account Role ARN. Check ARN or account status.")
             client._delete_session()
             exit(1)
 
+    except DeadlineExceeded as e:
+        print(f"\n{e}")
+        print(f"PARTIAL RESULT: completed steps: {', '.join(completed_steps) or 'none'}. Re-run the script to finish the remaining steps.")
+        client._delete_session()
+        exit(2)
     except Exception as e:
         print(f"\nAn error occurred: {e}")
     finally:
@@ -1,7 +1,10 @@
 import requests
 import os
 import argparse
+import time
 import json
+import hashlib
+import threading
 from typing import List
 
 # A class to define the GraphQL queries and mutations with their variables
@@ -111,14 +114,85 @@ class QueriesAndMutations():
             variables=variables
         )
 
+# Default (connect, read) timeouts in seconds for every type of API call
+DEFAULT_TIMEOUTS = {
+    "authenticate": (10, 30),
+    "graphql": (10, 120),
+    "delete_session": (10, 30)
+}
+
+
+# An exception raised when the overall deadline of a run has passed
+class DeadlineExceeded(Exception):
+    def __init__(self, message, partial_result=None):
+        super().__init__(message)
+        self.partial_result = partial_result
+
+
+# A class tracking the remaining time budget of a run
+class Deadline:
+    def __init__(self, seconds: float = None):
+        self.expires_at = time.monotonic() + seconds if seconds is not None else None
+
+    def remaining(self):
+        """Return the remaining seconds, or None if there is no deadline."""
+        if self.expires_at is None:
+            return None
+        return max(0.0, self.expires_at - time.monotonic())
+
+    def check(self, step: str):
+        """Raise DeadlineExceeded if the deadline has passed before the given step."""
+        if self.remaining() == 0:
+            raise DeadlineExceeded(f"Deadline exceeded before {step}.")
+
+    def timeout(self, timeout: tuple, step: str):
+        """Return a (connect, read) timeout capped to the remaining budget."""
+        self.check(step)
+        remaining = self.remaining()
+        if remaining is None:
+            return timeout
+        return tuple(min(value, remaining) for value in timeout)
+
+
+# A class holding the outcome of a GraphQL call that other threads may be waiting on
+class InFlightCall:
+    def __init__(self):
+        self.done = threading.Event()
+        self.response = None
+        self.error = None
+
+    def raise_error(self):
+        """
+        Raise the error of the call in a waiting thread. Every waiter gets its own exception of the
+        same type and attributes, so tracebacks are not shared between threads. Errors that cannot
+        be recreated, and interruptions such as KeyboardInterrupt, are raised as Exception.
+        """
+        error = None
+        if isinstance(self.error, Exception):
+            try:
+                error = type(self.error)(*self.error.args)
+                error.__dict__.update(self.error.__dict__)
+            except Exception:
+                error = None
+        if error is None:
+            error = Exception(f"GraphQL call failed: {type(self.error).__name__}: {self.error}")
+        raise error from self.error
+
+
 # A class to connect and send requests to the Rubrik API (RSC)
 class RubrikClient:
-    def __init__(self, client_id=None, client_secret=None, env_name=None):
+    def __init__(self, client_id=None, client_secret=None, env_name=None, timeouts: dict = None, deadline: Deadline = None):
         self.base_url = f"https://{env_name}.my.rubrik.com"
         self.token = None
         self.client_id = client_id if client_id else os.getenv('RUBRIK_CLIENT_ID')
         self.client_secret = client_secret if client_secret else os.getenv('RUBRIK_CLIENT_SECRET')
         self.headers = {'Content-Type': 'application/json'}
+        self.timeouts = {**DEFAULT_TIMEOUTS, **(timeouts or {})}
+        self.deadline = deadline if deadline else Deadline()
+        self._in_flight = {}
+        self._in_flight_lock = threading.Lock()
+        self.graphql_calls_sent = 0
+        self.graphql_calls_coalesced = 0
         self._authenticate()
 
     def _authenticate(self):
@@ -128,7 +202,7 @@ class RubrikClient:
             "client_id": self.client_id,
             "client_secret": self.client_secret
         }
-        response = requests.post(url, json=payload, headers=self.headers)
+        response = requests.post(url, json=payload, headers=self.headers, timeout=self.deadline.timeout(self.timeouts["authenticate"], step="authentication"))
         if response.status_code == 200:
             self.token = response.json().get('access_token')
             self.headers['Authorization'] = f"Bearer {self.token}"
@@ -140,7 +214,8 @@ class RubrikClient:
         """Delete the current session."""
         if self.token:
             url = f"{self.base_url}/api/session"
-            response = requests.delete(url, headers=self.headers)
+            # Not capped by the deadline so the session is still cleaned up after it has passed
+            response = requests.delete(url, headers=self.headers, timeout=self.timeouts["delete_session"])
             if response.status_code in [200, 204]:
                 print("Session deleted successfully.")
                 self.token = None
@@ -151,9 +226,52 @@ class RubrikClient:
             print("No active session to delete.")
 
     def _send_graphql_call(self, payload):
-        """Send a GraphQL call to the Rubrik API and return the JSON response."""
+        """
+        Send a GraphQL call to the Rubrik API and return the JSON response.
+        Identical read-only queries sent concurrently from several threads are coalesced into a
+        single HTTP call whose response is shared by all callers, so treat responses as read-only.
+        Mutations are always sent individually.
+        """
+        if payload["query"].lstrip().startswith("mutation"):
+            return self._post_graphql_call(payload)
+
+        key = hashlib.sha256(json.dumps(payload, sort_keys=True).encode()).hexdigest()
+        with self._in_flight_lock:
+            call = self._in_flight.get(key)
+            is_leader = call is None
+            if is_leader:
+                call = self._in_flight[key] = InFlightCall()
+            else:
+                self.graphql_calls_coalesced += 1
+
+        if not is_leader:
+            call.done.wait()
+            if call.error is not None:
+                call.raise_error()
+            return call.response
+
+        try:
+            call.response = self._post_graphql_call(payload)
+            return call.response
+        except BaseException as e:
+            # Also record interruptions, so waiters never mistake a missing response for a result
+            call.error = e
+            raise
+        finally:
+            with self._in_flight_lock:
+                del self._in_flight[key]
+            call.done.set()
+
+    def _post_graphql_call(self, payload):
+        """Post a GraphQL call to the Rubrik API and return the JSON response."""
         url = f"{self.base_url}/api/graphql"
-        response = requests.post(url, json=payload, headers=self.headers)
+        try:
+            response = requests.post(url, json=payload, headers=self.headers, timeout=self.deadline.timeout(self.timeouts["graphql"], step="the GraphQL call"))
+        except requests.Timeout as e:
+            self.deadline.check("the GraphQL call completed")
+            raise Exception(f"GraphQL query timed out: {e}")
+        with self._in_flight_lock:
+            self.graphql_calls_sent += 1
         if response.ok:
             return response.json()
         else:
@@ -281,10 +399,23 @@ if __name__ == "__main__":
     parser.add_argument("--azure_rg_name", help="Optional: Azure Resource Group Name for the feature (e.g., 'rubrik-rg'). Required for some features.", default=None)
     parser.add_argument("--azure_rg_region", help="Optional: Azure Resource Group Region for the feature (e.g., 'UKSOUTH'). Required for some features.", default=None)
 
+    # Timeouts and overall deadline
+    parser.add_argument("--auth_timeout", help="Connect and read timeouts in seconds for authentication.", nargs=2, type=float, metavar=("CONNECT", "READ"), default=DEFAULT_TIMEOUTS["authenticate"])
+    parser.add_argument("--graphql_timeout", help="Connect and read timeouts in seconds for each GraphQL call.", nargs=2, type=float, metavar=("CONNECT", "READ"), default=DEFAULT_TIMEOUTS["graphql"])
+    parser.add_argument("--session_timeout", help="Connect and read timeouts in seconds for deleting the session.", nargs=2, type=float, metavar=("CONNECT", "READ"), default=DEFAULT_TIMEOUTS["delete_session"])
+    parser.add_argument("--deadline", help="Overall time budget for the run in seconds. Once exceeded, outstanding work is abandoned and partial results are reported.", type=float, default=None)
+
     args = parser.parse_args()
 
-    client = RubrikClient(client_id=args.client_id, client_secret=args.client_secret, env_name=args.env_name)
+    timeouts = {
+        "authenticate": tuple(args.auth_timeout),
+        "graphql": tuple(args.graphql_timeout),
+        "delete_session": tuple(args.session_timeout)
+    }
+    client = RubrikClient(client_id=args.client_id, client_secret=args.client_secret, env_name=args.env_name,
+                          timeouts=timeouts, deadline=Deadline(args.deadline))
 
+    completed_steps = []
     try:
         # --- Step 1: Set Azure Customer App Credentials ---
         print("\n--- Step 1: Setting Azure Customer App Credentials ---")
@@ -299,6 +430,7 @@ if __name__ == "__main__":
 
         if set_creds_success:
             print("Azure customer app credentials set successfully.")
+            completed_steps.append("Step 1: Set app credentials")
         else:
             print("Failed to set Azure customer app credentials. Check inputs or existing credentials.")
             client._delete_session()
@@ -308,6 +440,7 @@ if __name__ == "__main__":
         # Note: The example uses AZURE_SQL_DB_PROTECTION for getting permissions,
         # but the Add Cloud Account mutation uses CLOUD_NATIVE_BLOB_PROTECTION.
         # Adjust feature_type and permissions_groups below to match what you actually need permissions for.
+        client.deadline.check("Step 2")
         print("\n--- Step 2: Getting Required Permissions for Azure Role ---")
         required_permissions = client.get_azure_required_permissions(
             feature_type=args.azure_feature_type, # Use the feature type provided in args
@@ -329,6 +462,7 @@ if __name__ == "__main__":
             print("\n!!! IMPORTANT: Manually create a custom Azure role with these permissions and assign it to your Azure AD Application at the subscription level. !!!")
             print("!!! The script will pause here to allow you to perform this manual step. !!!")
             input("Press Enter to continue after creating and assigning the Azure custom role...") # Pause for user
+            completed_steps.append("Step 2: Get required permissions")
 
         else:
             print("Failed to retrieve required Azure permissions. This might indicate an issue with the feature type or an API error.")
@@ -336,6 +470,7 @@ if __name__ == "__main__":
             exit(1)
 
         # --- Step 3: Add Cloud Account without OAuth ---
+        client.deadline.check("Step 3")
         print("\n--- Step 3: Adding Azure Cloud Account without OAuth ---")
         add_account_response = client.add_azure_cloud_account_without_oauth(
             tenant_domain_name=args.azure_tenant_domain_name,
@@ -355,11 +490,17 @@ if __name__ == "__main__":
                     print(f"Successfully added Azure Subscription: {status_entry.get('azureSubscriptionName')} (ID: {status_entry.get('azureSubscriptionNativeId')})")
                     print(f"Rubrik Internal ID: {status_entry.get('azureSubscriptionRubrikId')}")
             print("Azure Cloud Account integration process initiated successfully. Check RSC UI for final status.")
+            completed_steps.append("Step 3: Add cloud account")
         else:
             print("Failed to add Azure Cloud Account. No status returned or unexpected response structure.")
             client._delete_session()
             exit(1)
 
+    except DeadlineExceeded as e:
+        print(f"\n{e}")
+        print(f"PARTIAL RESULT: completed steps: {', '.join(completed_steps) or 'none'}. Re-run the script to finish the remaining steps.")
+        client._delete_session()
+        exit(2)
     except Exception as e:
         print(f"\nAn error occurred: {e}")
     finally:
@@ -0,0 +1,511 @@
+import requests
+import os
+import csv
+import argparse
+import time
+import json
+import hashlib
+import threading
+from typing import List
+from concurrent.futures import ThreadPoolExecutor, as_completed, TimeoutError as FuturesTimeoutError
+
+# Subscription feature statuses that indicate RSC can use the rotated secret
+HEALTHY_SUBSCRIPTION_STATUSES = ["CONNECTED"]
+
+# A class to define the GraphQL queries and mutations with their variables
+class QueriesAndMutations():
+    @staticmethod
+    def azure_set_customer_app_credentials_payload(app_id: str,
+                                                   app_name: str,
+                                                   app_secret_key: str,
+                                                   tenant_domain_name: str,
+                                                   azure_cloud_type: str = "AZUREPUBLICCLOUD",
+                                                   should_replace: bool = False):
+        """
+        GraphQL mutation to set Azure Active Directory application credentials.
+        """
+        mutation = """
+            mutation AzureSetCustomerAppCredentialsMutation($input: SetAzureCloudAccountCustomerAppCredentialsInput!) {
+              setAzureCloudAccountCustomerAppCredentials(input: $input)
+            }
+        """
+        variables = {
+            "input": {
+                "appId": app_id,
+                "appName": app_name,
+                "appSecretKey": app_secret_key,
+                "tenantDomainName": tenant_domain_name,
+                "azureCloudType": azure_cloud_type,
+                "shouldReplace": should_replace
+            }
+        }
+        return dict(
+            query=mutation,
+            variables=variables
+        )
+
+    @staticmethod
+    def all_azure_cloud_account_tenants_payload(feature: str = "CLOUD_NATIVE_PROTECTION"):
+        """
+        GraphQL query to list the Azure tenants known to RSC, including the app registration
+        and the per-subscription feature status for each tenant.
+        """
+        query = """
+            query AllAzureCloudAccountTenants($feature: CloudAccountFeature!, $includeSubscriptionDetails: Boolean!) {
+              allAzureCloudAccountTenants(feature: $feature, includeSubscriptionDetails: $includeSubscriptionDetails) {
+                azureCloudAccountTenantRubrikId
+                domainName
+                appName
+                clientId
+                cloudType
+                subscriptions {
+                  id
+                  name
+                  nativeId
+                  featureDetail {
+                    feature
+                    status
+                  }
+                }
+              }
+            }
+        """
+        variables = {
+            "feature": feature,
+            "includeSubscriptionDetails": True
+        }
+        return dict(
+            query=query,
+            variables=variables
+        )
+
+# Default (connect, read) timeouts in seconds for every type of API call
+DEFAULT_TIMEOUTS = {
+    "authenticate": (10, 30),
+    "graphql": (10, 120),
+    "delete_session": (10, 30)
+}
+
+
+# An exception raised when the overall deadline of a run has passed
+class DeadlineExceeded(Exception):
+    def __init__(self, message, partial_result=None):
+        super().__init__(message)
+        self.partial_result = partial_result
+
+
+# An exception raised when a mutation was sent but no response arrived, so RSC may or may not have applied it
+class OutcomeUnknown(Exception):
+    pass
+
+
+# A class tracking the remaining time budget of a run
+class Deadline:
+    def __init__(self, seconds: float = None):
+        self.expires_at = time.monotonic() + seconds if seconds is not None else None
+
+    def remaining(self):
+        """Return the remaining seconds, or None if there is no deadline."""
+        if self.expires_at is None:
+            return None
+        return max(0.0, self.expires_at - time.monotonic())
+
+    def check(self, step: str):
+        """Raise DeadlineExceeded if the deadline has passed before the given step."""
+        if self.remaining() == 0:
+            raise DeadlineExceeded(f"Deadline exceeded before {step}.")
+
+    def timeout(self, timeout: tuple, step: str):
+        """Return a (connect, read) timeout capped to the remaining budget."""
+        self.check(step)
+        remaining = self.remaining()
+        if remaining is None:
+            return timeout
+        return tuple(min(value, remaining) for value in timeout)
+
+
+# A class holding the outcome of a GraphQL call that other threads may be waiting on
+class InFlightCall:
+    def __init__(self):
+        self.done = threading.Event()
+        self.response = None
+        self.error = None
+
+    def raise_error(self):
+        """
+        Raise the error of the call in a waiting thread. Every waiter gets its own exception of the
+        same type and attributes, so tracebacks are not shared between threads. Errors that cannot
+        be recreated, and interruptions such as KeyboardInterrupt, are raised as Exception.
+        """
+        error = None
+        if isinstance(self.error, Exception):
+            try:
+                error = type(self.error)(*self.error.args)
+                error.__dict__.update(self.error.__dict__)
+            except Exception:
+                error = None
+        if error is None:
+            error = Exception(f"GraphQL call failed: {type(self.error).__name__}: {self.error}")
+        raise error from self.error
+
+
+# A class to connect and send requests to the Rubrik API (RSC)
+class RubrikClient:
+    def __init__(self, client_id=None, client_secret=None, env_name=None, timeouts: dict = None, deadline: Deadline = None):
+        self.base_url = f"https://{env_name}.my.rubrik.com"
+        self.token = None
+        self.client_id = client_id if client_id else os.getenv('RUBRIK_CLIENT_ID')
+        self.client_secret = client_secret if client_secret else os.getenv('RUBRIK_CLIENT_SECRET')
+        self.headers = {'Content-Type': 'application/json'}
+        self.timeouts = {**DEFAULT_TIMEOUTS, **(timeouts or {})}
+        self.deadline = deadline if deadline else Deadline()
+        self._in_flight = {}
+        self._in_flight_lock = threading.Lock()
+        self.graphql_calls_sent = 0
+        self.graphql_calls_coalesced = 0
+        self._authenticate()
+
+    def _authenticate(self):
+        """Authenticate with the Rubrik API using client credentials."""
+        url = f"{self.base_url}/api/client_token"
+        payload = {
+            "client_id": self.client_id,
+            "client_secret": self.client_secret
+        }
+        response = requests.post(url, json=payload, headers=self.headers, timeout=self.deadline.timeout(self.timeouts["authenticate"], step="authentication"))
+        if response.status_code == 200:
+            self.token = response.json().get('access_token')
+            self.headers['Authorization'] = f"Bearer {self.token}"
+            print("Connected to RSC...")
+        else:
+            raise Exception(f"Authentication failed: {response.text}")
+
+    def _delete_session(self):
+        """Delete the current session."""
+        if self.token:
+            url = f"{self.base_url}/api/session"
+            # Not capped by the deadline so the session is still cleaned up after it has passed
+            response = requests.delete(url, headers=self.headers, timeout=self.timeouts["delete_session"])
+            if response.status_code in [200, 204]:
+                print("Session deleted successfully.")
+                self.token = None
+                print("Disconnected from RSC.")
+            else:
+                raise Exception(f"Failed to delete session: {response.text}")
+        else:
+            print("No active session to delete.")
+
+    def _send_graphql_call(self, payload):
+        """
+        Send a GraphQL call to the Rubrik API and return the JSON response.
+        Identical read-only queries sent concurrently from several threads are coalesced into a
+        single HTTP call whose response is shared by all callers, so treat responses as read-only.
+        Mutations are always sent individually.
+        """
+        if payload["query"].lstrip().startswith("mutation"):
+            return self._post_graphql_call(payload)
+
+        key = hashlib.sha256(json.dumps(payload, sort_keys=True).encode()).hexdigest()
+        with self._in_flight_lock:
+            call = self._in_flight.get(key)
+            is_leader = call is None
+            if is_leader:
+                call = self._in_flight[key] = InFlightCall()
+            else:
+                self.graphql_calls_coalesced += 1
+
+        if not is_leader:
+            call.done.wait()
+            if call.error is not None:
+                call.raise_error()
+            return call.response
+
+        try:
+            call.response = self._post_graphql_call(payload)
+            return call.response
+        except BaseException as e:
+            # Also record interruptions, so waiters never mistake a missing response for a result
+            call.error = e
+            raise
+        finally:
+            with self._in_flight_lock:
+                del self._in_flight[key]
+            call.done.set()
+
+    def _post_graphql_call(self, payload):
+        """Post a GraphQL call to the Rubrik API and return the JSON response."""
+        url = f"{self.base_url}/api/graphql"
+        try:
+            response = requests.post(url, json=payload, headers=self.headers, timeout=self.deadline.timeout(self.timeouts["graphql"], step="the GraphQL call"))
+        except requests.Timeout as e:
+            # Once a mutation has been sent, a timeout does not tell whether RSC applied it
+            if payload["query"].lstrip().startswith("mutation") and not isinstance(e, requests.ConnectTimeout):
+                reason = "the deadline passed" if self.deadline.remaining() == 0 else "the read timed out"
+                raise OutcomeUnknown(f"The call was sent but {reason} before RSC answered; RSC may still have applied it.")
+            self.deadline.check("the GraphQL call completed")
+            raise Exception(f"GraphQL query timed out: {e}")
+        with self._in_flight_lock:
+            self.graphql_calls_sent += 1
+        if response.ok:
+            return response.json()
+        else:
+            raise Exception(f"GraphQL query failed: {response.text}")
+
+    def set_azure_customer_app_credentials(self, app_id: str,
+                                           app_name: str,
+                                           app_secret_key: str,
+                                           tenant_domain_name: str,
+                                           azure_cloud_type: str = "AZUREPUBLICCLOUD",
+                                           should_replace: bool = False):
+        """
+        Set Azure Active Directory application credentials in RSC.
+        """
+        print(f"Setting Azure customer app credentials for tenant: {tenant_domain_name}...")
+        payload = QueriesAndMutations.azure_set_customer_app_credentials_payload(
+            app_id=app_id,
+            app_name=app_name,
+            app_secret_key=app_secret_key,
+            tenant_domain_name=tenant_domain_name,
+            azure_cloud_type=azure_cloud_type,
+            should_replace=should_replace
+        )
+        response = self._send_graphql_call(payload=payload)
+        if response.get("errors"):
+            raise Exception(response["errors"][0].get("message"))
+        return response.get("data", {}).get("setAzureCloudAccountCustomerAppCredentials")
+
+    def get_azure_cloud_account_tenants(self, feature: str = "CLOUD_NATIVE_PROTECTION"):
+        """
+        Retrieve all Azure tenants known to RSC, keyed by lower-cased tenant domain name.
+        """
+        payload = QueriesAndMutations.all_azure_cloud_account_tenants_payload(feature=feature)
+        response = self._send_graphql_call(payload=payload)
+        tenants = response.get("data", {}).get("allAzureCloudAccountTenants") or []
+        return {tenant.get("domainName", "").lower(): tenant for tenant in tenants}
+
+
+def load_rotation_targets(csv_path: str):
+    """
+    Load the tenants to rotate from a CSV file.
+
+    Required columns are 'tenant_domain_name' and 'app_secret_key'. The optional columns
+    'app_id', 'app_name' and 'azure_cloud_type' override the values already registered in RSC.
+    """
+    targets = []
+    with open(csv_path, newline='') as csv_file:
+        for row in csv.DictReader(csv_file):
+            if not row.get("tenant_domain_name") or not row.get("app_secret_key"):
+                raise Exception(f"Row {len(targets) + 2} of {csv_path} is missing 'tenant_domain_name' or 'app_secret_key'.")
+            targets.append({key: value.strip() for key, value in row.items() if value})
+    return targets
+
+
+def rotate_tenant_secret(client: RubrikClient, target: dict, tenant: dict, should_replace: bool):
+    """
+    Rotate the app secret for a single tenant and return a result record for the report.
+    'rotated' is None when the outcome is unknown and the tenant must be re-checked.
+    The secret itself is never included in the result.
+    """
+    result = {
+        "tenant_domain_name": target["tenant_domain_name"],
+        "rotated": False,
+        "error": None
+    }
+    if tenant is None and not target.get("app_id"):
+        result["error"] = "Tenant not found in RSC and no app_id supplied."
+        return result
+    tenant = tenant or {}
+
+    try:
+        result["rotated"] = bool(client.set_azure_customer_app_credentials(
+            app_id=target.get("app_id") or tenant.get("clientId"),
+            app_name=target.get("app_name") or tenant.get("appName"),
+            app_secret_key=target["app_secret_key"],
+            tenant_domain_name=target["tenant_domain_name"],
+            azure_cloud_type=target.get("azure_cloud_type") or tenant.get("cloudType") or "AZUREPUBLICCLOUD",
+            should_replace=should_replace
+        ))
+        if not result["rotated"]:
+            result["error"] = "RSC did not accept the new app credentials."
+    except OutcomeUnknown as e:
+        result["rotated"] = None
+        result["error"] = f"Outcome unknown, re-check this tenant: {e}"
+    except Exception as e:
+        result["error"] = str(e)
+    return result
+
+
+def verify_tenant_subscriptions(tenant: dict, feature: str):
+    """
+    Return (healthy, unhealthy) subscription lists for a tenant, based on the status
+    RSC reports for the given feature.
+    """
+    if not tenant:
+        raise Exception("Tenant not found in RSC.")
+    healthy = []
+    unhealthy = []
+    for subscription in tenant.get("subscriptions") or []:
+        # featureDetail is a single object per subscription, not a list
+        detail = subscription.get("featureDetail") or {}
+        status = detail.get("status") if detail.get("feature") == feature else None
+        label = f"{subscription.get('name')} ({subscription.get('nativeId')})"
+        if status in HEALTHY_SUBSCRIPTION_STATUSES:
+            healthy.append(label)
+        else:
+            unhealthy.append(f"{label}: {status or 'NO_STATUS'}")
+    return healthy, unhealthy
+
+
+def write_report(report_path: str, results: List[dict]):
+    """Write the rotation results to a CSV report."""
+    fieldnames = ["tenant_domain_name", "rotated", "subscriptions_connected", "healthy_subscriptions", "unhealthy_subscriptions", "error"]
+    with open(report_path, "w", newline='') as report_file:
+        writer = csv.DictWriter(report_file, fieldnames=fieldnames)
+        writer.writeheader()
+        for result in results:
+            writer.writerow({
+                "tenant_domain_name": result["tenant_domain_name"],
+                "rotated": "UNKNOWN" if result["rotated"] is None else result["rotated"],
+                "subscriptions_connected": result.get("subscriptions_connected", False),
+                "healthy_subscriptions": "; ".join(result.get("healthy_subscriptions", [])),
+                "unhealthy_subscriptions": "; ".join(result.get("unhealthy_subscriptions", [])),
+                "error": result["error"] or ""
+            })
+
+
+# MAIN SCRIPT
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Rotate the Azure AD application secret for many Azure tenants in Rubrik RSC concurrently.")
+    parser.add_argument("--client_id", help="Client ID for Rubrik API authentication. Defaults to RUBRIK_CLIENT_ID environment variable if not provided.", default=None)
+    parser.add_argument("--client_secret", help="Client Secret for Rubrik API authentication. Defaults to RUBRIK_CLIENT_SECRET environment variable if not provided.", default=None)
+    parser.add_argument("--env_name", help="Environment name for the Rubrik Security Cloud instance. Example: 'mycompany' for 'mycompany.my.rubrik.com'. Do not include the domain names.", required=True)
+    parser.add_argument("--tenants_csv", help="CSV file with the columns 'tenant_domain_name' and 'app_secret_key' (optional: 'app_id', 'app_name', 'azure_cloud_type').", required=True)
+    parser.add_argument("--azure_feature", help="Cloud account feature used to look up tenants and verify subscriptions.", default="CLOUD_NATIVE_PROTECTION")
+    parser.add_argument("--should_replace_app_creds", help="Replace the existing app credentials in RSC.", action="store_true")
+    parser.add_argument("--max_workers", help="Maximum number of tenants rotated in parallel.", default=8, type=int)
+    parser.add_argument("--report", help="Path of the CSV report to write.", default="azure_secret_rotation_report.csv")
+    parser.add_argument("--verify_timeout", help="Maximum time in seconds to wait for the subscriptions of the rotated tenants to become healthy.", default=300, type=float)
+    parser.add_argument("--verify_interval", help="Time in seconds between subscription status checks.", default=15, type=float)
+
+    # Timeouts and overall deadline
+    parser.add_argument("--auth_timeout", help="Connect and read timeouts in seconds for authentication.", nargs=2, type=float, metavar=("CONNECT", "READ"), default=DEFAULT_TIMEOUTS["authenticate"])
+    parser.add_argument("--graphql_timeout", help="Connect and read timeouts in seconds for each GraphQL call.", nargs=2, type=float, metavar=("CONNECT", "READ"), default=DEFAULT_TIMEOUTS["graphql"])
+    parser.add_argument("--session_timeout", help="Connect and read timeouts in seconds for deleting the session.", nargs=2, type=float, metavar=("CONNECT", "READ"), default=DEFAULT_TIMEOUTS["delete_session"])
+    parser.add_argument("--deadline", help="Overall time budget for the run in seconds. Once exceeded, outstanding work is abandoned and partial results are reported.", type=float, default=None)
+
+    args = parser.parse_args()
+
+    targets = load_rotation_targets(args.tenants_csv)
+    print(f"Loaded {len(targets)} tenant(s) to rotate from {args.tenants_csv}.")
+
+    timeouts = {
+        "authenticate": tuple(args.auth_timeout),
+        "graphql": tuple(args.graphql_timeout),
+        "delete_session": tuple(args.session_timeout)
+    }
+    client = RubrikClient(client_id=args.client_id, client_secret=args.client_secret, env_name=args.env_name,
+                          timeouts=timeouts, deadline=Deadline(args.deadline))
+
+    results = []
+    try:
+        # --- Step 1: Look up the app registration for every tenant in a single call ---
+        print("\n--- Step 1: Getting the registered app information from RSC ---")
+        tenants = client.get_azure_cloud_account_tenants(feature=args.azure_feature)
+        print(f"RSC knows about {len(tenants)} Azure tenant(s).")
+
+        # --- Step 2: Rotate the secrets with bounded parallelism ---
+        print(f"\n--- Step 2: Rotating app secrets ({args.max_workers} in parallel) ---")
+        executor = ThreadPoolExecutor(max_workers=args.max_workers)
+        pending = {
+            executor.submit(rotate_tenant_secret, client, target,
+                            tenants.get(target["tenant_domain_name"].lower()), args.should_replace_app_creds)
+            for target in targets
+        }
+        try:
+            for future in as_completed(pending, timeout=client.deadline.remaining()):
+                pending.discard(future)
+                result = future.result()
+                results.append(result)
+                if result["rotated"] is None:
+                    status = f"UNKNOWN ({result['error']})"
+                else:
+                    status = "rotated" if result["rotated"] else f"FAILED ({result['error']})"
+                print(f"[{len(results)}/{len(targets)}] {result['tenant_domain_name']}: {status}")
+        except FuturesTimeoutError:
+            print("\nDeadline exceeded, cancelling the rotations that have not started yet...")
+        finally:
+            # Rotations already in flight finish within their deadline-capped timeouts
+            executor.shutdown(wait=True, cancel_futures=True)
+        results.extend(future.result() for future in pending if not future.cancelled())
+
+        # --- Step 3: Check the subscription status of every rotated tenant ---
+        # RSC updates the subscription status asynchronously, so give it one interval before the
+        # first check and poll until every rotated tenant is connected or the check time (capped
+        # by the deadline) runs out. The status does not show which secret RSC last used, so a
+        # subscription that stayed CONNECTED throughout is only reported as connected.
+        client.deadline.check("Step 3")
+        print(f"\n--- Step 3: Checking subscription status (up to {args.verify_timeout:g}s) ---")
+        verify_until = time.monotonic() + args.verify_timeout
+        unverified = [result for result in results if result["rotated"]]
+        first_wait = min(args.verify_interval, args.verify_timeout)
+        if client.deadline.remaining() is not None:
+            first_wait = min(first_wait, client.deadline.remaining())
+        if unverified and first_wait > 0:
+            print(f"Waiting {first_wait:g}s for RSC to refresh the subscription status...")
+            time.sleep(first_wait)
+        while unverified:
+            try:
+                tenants = client.get_azure_cloud_account_tenants(feature=args.azure_feature)
+            except DeadlineExceeded:
+                raise
+            except Exception as e:
+                for result in unverified:
+                    result["error"] = f"Subscription status check failed: {e}"
+                break
+            for result in unverified:
+                try:
+                    healthy, unhealthy = verify_tenant_subscriptions(tenants.get(result["tenant_domain_name"].lower()), args.azure_feature)
+                    result["healthy_subscriptions"] = healthy
+                    result["unhealthy_subscriptions"] = unhealthy
+                    result["subscriptions_connected"] = not unhealthy
+                    result["error"] = None
+                except Exception as e:
+                    result["subscriptions_connected"] = False
+                    result["error"] = f"Subscription status check failed: {e}"
+            unverified = [result for result in unverified if not result["subscriptions_connected"]]
+
+            wait = min(args.verify_interval, verify_until - time.monotonic())
+            if client.deadline.remaining() is not None:
+                wait = min(wait, client.deadline.remaining())
+            if not unverified or wait < args.verify_interval:
+                break
+            print(f"{len(unverified)} tenant(s) not connected yet, checking again in {args.verify_interval:g}s...")
+            time.sleep(wait)
+
+        for result in unverified:
+            for subscription in result.get("unhealthy_subscriptions", []):
+                print(f"{result['tenant_domain_name']}: subscription {subscription}")
+
+    except DeadlineExceeded as e:
+        print(f"\n{e} The report only contains the work completed before the deadline.")
+    except Exception as e:
+        print(f"\nAn error occurred: {e}")
+    finally:
+        client._delete_session()
+
+    # Report the tenants that were never attempted, e.g. because the deadline passed first
+    attempted = {result["tenant_domain_name"] for result in results}
+    reason = "Not attempted: deadline exceeded." if client.deadline.remaining() == 0 else "Not attempted."
+    results.extend({"tenant_domain_name": target["tenant_domain_name"], "rotated": False, "error": reason}
+                   for target in targets if target["tenant_domain_name"] not in attempted)
+
+    results.sort(key=lambda result: result["tenant_domain_name"])
+    write_report(args.report, results)
+    rotated = sum(1 for result in results if result["rotated"])
+    unknown = sum(1 for result in results if result["rotated"] is None)
+    connected = sum(1 for result in results if result.get("subscriptions_connected"))
+    print(f"\nRotated {rotated}/{len(targets)} tenant(s), {unknown} with an unknown outcome, {connected} with all subscriptions CONNECTED afterwards. Report written to {args.report}.")
+    print(f"GraphQL calls sent: {client.graphql_calls_sent}, identical read-only calls coalesced: {client.graphql_calls_coalesced}.")
+    print("\nScript execution finished.")
+    if connected != len(targets):
+        exit(1)
@@ -1,7 +1,10 @@
-import requests, os, csv, argparse, json
+import requests, urllib3, os, csv, argparse, json, ijson, time, hashlib, threading
 from typing import List
 from pydantic import BaseModel
 from datetime import datetime, timedelta, timezone
+from rubrik_sla_service import SlaStore, serve_sla_store
+from rubrik_sla_index import SlaScheduleIndex, TIERS, parse_filter
+from rubrik_sla_snapshot_file import SlaSnapshotFile, write_snapshot_file
 
 # A class to define the GraphQL queries
 class Queries():
@@ -79,14 +82,97 @@ class Queries():
         )
     
 
+# Default (connect, read) timeouts in seconds for every type of API call
+DEFAULT_TIMEOUTS = {
+    "authenticate": (10, 30),
+    "graphql": (10, 120),
+    "delete_session": (10, 30)
+}
+
+
+# An exception raised when the overall deadline of a run has passed
+class DeadlineExceeded(Exception):
+    def __init__(self, message, partial_result=None):
+        super().__init__(message)
+        self.partial_result = partial_result
+
+
+# Errors of a GraphQL call that timed out or lost its connection. Once the body is read with
+# read1, urllib3 raises its own exceptions instead of the requests wrappers.
+READ_ERRORS = (requests.Timeout, urllib3.exceptions.TimeoutError, urllib3.exceptions.ProtocolError)
+
+
+# An exception raised when RSC answers a GraphQL call with an HTTP error
+class GraphQLCallFailed(Exception):
+    def __init__(self, message, status_code=None):
+        super().__init__(message)
+        self.status_code = status_code
+
+
+# A class tracking the remaining time budget of a run
+class Deadline:
+    def __init__(self, seconds: float = None):
+        self.expires_at = time.monotonic() + seconds if seconds is not None else None
+
+    def remaining(self):
+        """Return the remaining seconds, or None if there is no deadline."""
+        if self.expires_at is None:
+            return None
+        return max(0.0, self.expires_at - time.monotonic())
+
+    def check(self, step: str):
+        """Raise DeadlineExceeded if the deadline has passed before the given step."""
+        if self.remaining() == 0:
+            raise DeadlineExceeded(f"Deadline exceeded before {step}.")
+
+    def timeout(self, timeout: tuple, step: str):
+        """Return a (connect, read) timeout capped to the remaining budget."""
+        self.check(step)
+        remaining = self.remaining()
+        if remaining is None:
+            return timeout
+        return tuple(min(value, remaining) for value in timeout)
+
+
+# A class holding the outcome of a GraphQL call that other threads may be waiting on
+class InFlightCall:
+    def __init__(self):
+        self.done = threading.Event()
+        self.response = None
+        self.error = None
+
+    def raise_error(self):
+        """
+        Raise the error of the call in a waiting thread. Every waiter gets its own exception of the
+        same type and attributes, so tracebacks are not shared between threads. Errors that cannot
+        be recreated, and interruptions such as KeyboardInterrupt, are raised as Exception.
+        """
+        error = None
+        if isinstance(self.error, Exception):
+            try:
+                error = type(self.error)(*self.error.args)
+                error.__dict__.update(self.error.__dict__)
+            except Exception:
+                error = None
+        if error is None:
+            error = Exception(f"GraphQL call failed: {type(self.error).__name__}: {self.error}")
+        raise error from self.error
+
+
 # A class to connect and send requests to the Rubrik API (RSC)
 class RubrikClient:
-    def __init__(self, client_id=None, client_secret=None, env_name=None):
+    def __init__(self, client_id=None, client_secret=None, env_name=None, timeouts: dict = None, deadline: Deadline = None):
         self.base_url = f"https://{env_name}.my.rubrik.com"
         self.token = None
         self.client_id = client_id if client_id else os.getenv('RUBRIK_CLIENT_ID')
         self.client_secret = client_secret if client_secret else os.getenv('RUBRIK_CLIENT_SECRET')
         self.headers = {'Content-Type': 'application/json'}
+        self.timeouts = {**DEFAULT_TIMEOUTS, **(timeouts or {})}
+        self.deadline = deadline if deadline else Deadline()
+        self._in_flight = {}
+        self._in_flight_lock = threading.Lock()
+        self.graphql_calls_sent = 0
+        self.graphql_calls_coalesced = 0
         self._authenticate()
 
 
@@ -97,7 +183,7 @@ class RubrikClient:
             "client_id": self.client_id,
             "client_secret": self.client_secret
         }
-        response = requests.post(url, json=payload, headers=self.headers)
+        response = requests.post(url, json=payload, headers=self.headers, timeout=self.deadline.timeout(self.timeouts["authenticate"], step="authentication"))
         if response.status_code == 200:
             self.token = response.json().get('access_token')
 
@@ -111,7 +197,8 @@ class RubrikClient:
         """Delete the current session."""
         if self.token:
             url = f"{self.base_url}/api/session"
-            response = requests.delete(url, headers=self.headers)
+            # Not capped by the deadline so the session is still cleaned up after it has passed
+            response = requests.delete(url, headers=self.headers, timeout=self.timeouts["delete_session"])
             if response.status_code in [200, 204]:
                 print("Session deleted successfully.")
                 self.token = None
@@ -123,14 +210,90 @@ class RubrikClient:
 
 
     def _send_graphql_call(self, payload):
-        """Send a GraphQL cal to the Rubrik API and return the JSON response."""
+        """
+        Send a GraphQL call to the Rubrik API and return the JSON response.
+        Identical read-only queries sent concurrently from several threads are coalesced into a
+        single HTTP call whose response is shared by all callers, so treat responses as read-only.
+        Mutations are always sent individually.
+        """
+        if payload["query"].lstrip().startswith("mutation"):
+            return self._post_graphql_call(payload)
+
+        key = hashlib.sha256(json.dumps(payload, sort_keys=True).encode()).hexdigest()
+        with self._in_flight_lock:
+            call = self._in_flight.get(key)
+            is_leader = call is None
+            if is_leader:
+                call = self._in_flight[key] = InFlightCall()
+            else:
+                self.graphql_calls_coalesced += 1
+
+        if not is_leader:
+            call.done.wait()
+            if call.error is not None:
+                call.raise_error()
+            return call.response
+
+        try:
+            call.response = self._post_graphql_call(payload)
+            return call.response
+        except BaseException as e:
+            # Also record interruptions, so waiters never mistake a missing response for a result
+            call.error = e
+            raise
+        finally:
+            with self._in_flight_lock:
+                del self._in_flight[key]
+            call.done.set()
+
+
+    def _post_graphql_call(self, payload):
+        """Post a GraphQL call to the Rubrik API and return the JSON response."""
         url = f"{self.base_url}/api/graphql"
-        payload = payload
-        response = requests.post(url, json=payload, headers=self.headers)
+        chunks = []
+        try:
+            timeout = self.deadline.timeout(self.timeouts["graphql"], step="the GraphQL call")
+            with requests.post(url, json=payload, headers=self.headers, stream=True, timeout=timeout) as response:
+                with self._in_flight_lock:
+                    self.graphql_calls_sent += 1
+                chunks.extend(self._iter_response_chunks(response))
+        except READ_ERRORS as e:
+            self._raise_read_error(e)
+        body = b"".join(chunks)
         if response.ok:
-            return response.json()
+            return json.loads(body)
         else:
-            raise Exception(f"GraphQL query failed: {response.text}")
+            raise GraphQLCallFailed(f"GraphQL query failed: {body.decode(errors='replace')}", status_code=response.status_code)
+
+
+    def _raise_read_error(self, error):
+        """
+        Raise DeadlineExceeded if a failed GraphQL call ran into the deadline, otherwise an
+        exception describing the timeout or the broken connection.
+        """
+        self.deadline.check("the GraphQL call completed")
+        if isinstance(error, (requests.Timeout, urllib3.exceptions.TimeoutError)):
+            raise Exception(f"GraphQL query timed out: {error}")
+        raise Exception(f"GraphQL response was interrupted: {error}")
+
+
+    def _iter_response_chunks(self, response):
+        """
+        Yield the body of a streamed response as it arrives. The read timeout only bounds each
+        socket read, so the deadline is checked between reads; read1 returns after a single read,
+        so a slowly trickling body cannot outlast the deadline by more than one read timeout.
+        """
+        while True:
+            self.deadline.check("the GraphQL response was received")
+            chunk = response.raw.read1(65536, decode_content=True)
+            if not chunk:
+                return
+            yield chunk
+
+
+    def reset_deadline(self, seconds: float = None):
+        """Start a new deadline, e.g. for every refresh of a long-running service."""
+        self.deadline = Deadline(seconds)
 
 
     def _get_sla_domains(self):
@@ -141,7 +304,10 @@ class RubrikClient:
 
         while hasnextpage:
             slaDomains_payload = Queries.get_sla_domains(after_cursor=after_cursor)
-            response = self._send_graphql_call(payload=slaDomains_payload)
+            try:
+                response = self._send_graphql_call(payload=slaDomains_payload)
+            except DeadlineExceeded as e:
+                raise DeadlineExceeded(f"{e} {len(sladomains)} SLA domains were retrieved.", partial_result=sladomains)
             sladomains_page = response.get("data", {}).get("slaDomains", {})
             sladomains.extend(sladomains_page.get("edges", []))
             pageInfo = sladomains_page.get("pageInfo", {})
@@ -149,42 +315,224 @@ class RubrikClient:
             after_cursor = pageInfo.get("endCursor", None)
             print(f"\tSLA domains retrieved so far: {len(sladomains)}. end_cursor: {after_cursor}")
         return sladomains
+
+
+    def _stream_graphql_nodes(self, payload, connection: str, page_info: dict):
+        """
+        Send a GraphQL call and parse the response body incrementally as it arrives, yielding
+        every edges[].node of the given connection as soon as it is complete. Only the node
+        being parsed is held in memory. The connection's pageInfo fields are stored in page_info.
+        """
+        url = f"{self.base_url}/api/graphql"
+        node_prefix = f"data.{connection}.edges.item.node"
+        page_info_prefix = f"data.{connection}.pageInfo."
+        errors = []
+
+        try:
+            timeout = self.deadline.timeout(self.timeouts["graphql"], step="the GraphQL call")
+            with requests.post(url, json=payload, headers=self.headers, stream=True, timeout=timeout) as response:
+                # Streamed calls are never coalesced, but they are counted like every other call
+                with self._in_flight_lock:
+                    self.graphql_calls_sent += 1
+                if not response.ok:
+                    raise GraphQLCallFailed(f"GraphQL query failed: {response.text}", status_code=response.status_code)
+                events = ijson.sendable_list()
+                parser = ijson.parse_coro(events, use_float=True)
+                builder = None
+                for chunk in self._iter_response_chunks(response):
+                    parser.send(chunk)
+                    for prefix, event, value in events:
+                        if builder is not None:
+                            builder.event(event, value)
+                            if prefix == node_prefix and event == "end_map":
+                                yield builder.value
+                                builder = None
+                        elif prefix == node_prefix and event == "start_map":
+                            builder = ijson.ObjectBuilder()
+                            builder.event(event, value)
+                        elif prefix.startswith(page_info_prefix) and event in ["boolean", "string", "null"]:
+                            page_info[prefix[len(page_info_prefix):]] = value
+                        elif prefix == "errors.item.message":
+                            errors.append(value)
+                    del events[:]
+                parser.close()
+        except READ_ERRORS as e:
+            self._raise_read_error(e)
+
+        if errors:
+            raise Exception(f"GraphQL query failed: {'; '.join(errors)}")
+
+
+    def _stream_sla_domains(self):
+        """Yield all SLA domain edges, parsing every page incrementally as it is received."""
+        after_cursor = None
+        hasnextpage = True
+        retrieved = 0
+
+        while hasnextpage:
+            slaDomains_payload = Queries.get_sla_domains(after_cursor=after_cursor)
+            pageInfo = {}
+            for node in self._stream_graphql_nodes(payload=slaDomains_payload, connection="slaDomains", page_info=pageInfo):
+                retrieved += 1
+                yield {"node": node}
+            hasnextpage = pageInfo.get("hasNextPage", False)
+            after_cursor = pageInfo.get("endCursor", None)
+            print(f"\tSLA domains retrieved so far: {retrieved}. end_cursor: {after_cursor}")
     
     
 
+def print_sla_domain(sladomain):
+    """Print the name, ID and snapshot schedule of an SLA domain edge."""
+    print(f"SLA Domain Name: {sladomain['node']['name']}, ID: {sladomain['node']['id']}")
+    #print(f"Snapshot Schedule: {sladomain['node']['snapshotSchedule']}")
+    snapshot_schedule = sladomain['node']['snapshotSchedule']
+    for schedule_type, schedule in snapshot_schedule.items():
+        if schedule and 'basicSchedule' in schedule:
+            basic_schedule = schedule['basicSchedule']
+            print(f"{schedule_type.capitalize()} Schedule: Frequency: {basic_schedule['frequency']}, Retention: {basic_schedule['retention']} {basic_schedule['retentionUnit']}")
+        else:
+            print(f"{schedule_type.capitalize()} Schedule: Not configured")
+    print("\n")
+
+
 # MAIN SCRIPT
 if __name__ == "__main__":
     parser = argparse.ArgumentParser(description="Rubrik CDM nodes..")
     parser.add_argument("--client_id", help="Client ID for Rubrik API authentication. Defaults to RUBRIK_CLIENT_ID environment variable if not provided.", default=None)
     parser.add_argument("--client_secret", help="Client Secret for Rubrik API authentication. Defaults to RUBRIK_CLIENT_SECRET environment variable if not provided.", default=None)
     parser.add_argument("--env_name", help="Environment name for the Rubrik Security Cloud instance. Example: 'rscetf' for 'rscetf.my.rubrik.com'. Do not include the domain names.", default=None)
+    parser.add_argument("--filter", help="Only show SLA domains matching this filter, e.g. 'daily.retention_days<30'. Can be repeated; all filters must match.", action="append", default=[])
+    parser.add_argument("--missing", help="Only show SLA domains without this schedule tier, e.g. 'yearly'. Can be repeated.", action="append", default=[])
+    parser.add_argument("--footprint", help="Write the retained snapshot count per tier and the retention horizon of every SLA domain to this CSV file.", default=None)
+    parser.add_argument("--stream", help="Parse each page of SLA domains incrementally while it is received instead of buffering the whole response.", action="store_true")
+    parser.add_argument("--write_snapshot", help="Publish the SLA domains to this columnar snapshot file for other processes to read.", default=None)
+    parser.add_argument("--from_snapshot", help="Read the SLA domains from this snapshot file instead of connecting to RSC.", default=None)
+    parser.add_argument("--serve", help="Run as a long-lived service that keeps the SLA domains in memory and serves lookups over HTTP.", action="store_true")
+    parser.add_argument("--listen", help="Host and port the service listens on when --serve is used.", default="127.0.0.1:8080")
+    parser.add_argument("--unix_socket", help="Serve on this Unix socket path instead of --listen when --serve is used.", default=None)
+    parser.add_argument("--refresh_interval", help="Seconds between background refreshes of the SLA domains when --serve is used.", default=900, type=int)
+
+    # Timeouts and overall deadline
+    parser.add_argument("--auth_timeout", help="Connect and read timeouts in seconds for authentication.", nargs=2, type=float, metavar=("CONNECT", "READ"), default=DEFAULT_TIMEOUTS["authenticate"])
+    parser.add_argument("--graphql_timeout", help="Connect and read timeouts in seconds for each GraphQL call.", nargs=2, type=float, metavar=("CONNECT", "READ"), default=DEFAULT_TIMEOUTS["graphql"])
+    parser.add_argument("--session_timeout", help="Connect and read timeouts in seconds for deleting the session.", nargs=2, type=float, metavar=("CONNECT", "READ"), default=DEFAULT_TIMEOUTS["delete_session"])
+    parser.add_argument("--deadline", help="Overall time budget for the run in seconds. Once exceeded, outstanding work is abandoned and partial results are reported.", type=float, default=None)
 
     args = parser.parse_args()
+    if args.serve and args.from_snapshot:
+        parser.error("--from_snapshot cannot be used with --serve.")
+
+    # Validate the filters before connecting, so a typo does not cost a full fetch
+    for tier in args.missing:
+        if tier not in TIERS:
+            parser.error(f"Unknown tier '{tier}' for --missing. Tiers: {', '.join(TIERS)}.")
+    filters = args.filter + [f"{tier}.configured==false" for tier in args.missing]
+    for expression in filters:
+        try:
+            parse_filter(expression)
+        except ValueError as e:
+            parser.error(str(e))
+
+    timeouts = {
+        "authenticate": tuple(args.auth_timeout),
+        "graphql": tuple(args.graphql_timeout),
+        "delete_session": tuple(args.session_timeout)
+    }
+    client = None
+    if not args.from_snapshot:
+        client = RubrikClient(client_id=args.client_id, client_secret=args.client_secret, env_name=args.env_name,
+                              timeouts=timeouts, deadline=Deadline(args.deadline))
+
+    if args.serve:
+        # In service mode the deadline applies to every refresh rather than to the whole run
+        store = SlaStore(client, refresh_interval=args.refresh_interval, refresh_deadline=args.deadline)
+        try:
+            store.start()
+            serve_sla_store(store, listen=args.listen, unix_socket=args.unix_socket)
+        finally:
+            store.stop()
+            client._delete_session()
+        exit(0)
+
+    deadline_exceeded = False
+    streamed = False
+    if args.from_snapshot:
+        # Read the SLA domains published by another run instead of connecting to RSC
+        print(f"Reading SLA domains from {args.from_snapshot}...")
+        with SlaSnapshotFile(args.from_snapshot) as snapshot_file:
+            sladomains = [{"node": snapshot_file.node(row)} for row in range(len(snapshot_file))]
+    elif args.stream and not filters and not args.footprint and not args.write_snapshot:
+        # Print every SLA domain as soon as it is parsed instead of holding all pages in memory
+        print("Retrieving SLA domains...")
+        retrieved = 0
+        try:
+            for sladomain in client._stream_sla_domains():
+                print_sla_domain(sladomain)
+                retrieved += 1
+        except DeadlineExceeded as e:
+            print(f"\n{e}")
+            print(f"PARTIAL RESULT: only the {retrieved} SLA domains printed above were retrieved before the deadline.")
+            client._delete_session()
+            exit(2)
+        except Exception:
+            client._delete_session()
+            raise
+        print(f"Total SLA domains retrieved: {retrieved}")
+        sladomains = retrieved
+        streamed = True
+    else:
+        print("Retrieving SLA domains...")
+        try:
+            if args.stream:
+                sladomains = []
+                for sladomain in client._stream_sla_domains():
+                    sladomains.append(sladomain)
+            else:
+                sladomains = client._get_sla_domains()
+        except DeadlineExceeded as e:
+            print(f"\n{e}")
+            print("PARTIAL RESULT: the output below only covers the SLA domains retrieved before the deadline.")
+            sladomains = e.partial_result if e.partial_result is not None else sladomains
+            deadline_exceeded = True
+        except Exception:
+            client._delete_session()
+            raise
 
-    client = RubrikClient(client_id=args.client_id, client_secret=args.client_secret, env_name=args.env_name)
-
-    print("Retrieving SLA domains...")
-    sladomains = client._get_sla_domains()
-    print(f"Total SLA domains retrieved: {len(sladomains)}")
-    for sladomain in sladomains:
-        print(f"SLA Domain Name: {sladomain['node']['name']}, ID: {sladomain['node']['id']}")
-        #print(f"Snapshot Schedule: {sladomain['node']['snapshotSchedule']}")
-        snapshot_schedule = sladomains[0]['node']['snapshotSchedule']
-        for schedule_type, schedule in snapshot_schedule.items():
-            if schedule and 'basicSchedule' in schedule:
-                basic_schedule = schedule['basicSchedule']
-                print(f"{schedule_type.capitalize()} Schedule: Frequency: {basic_schedule['frequency']}, Retention: {basic_schedule['retention']} {basic_schedule['retentionUnit']}")
+    if not streamed:
+        print(f"Total SLA domains retrieved: {len(sladomains)}")
+        if args.write_snapshot:
+            if deadline_exceeded:
+                # Never publish a partial set; readers keep the previous complete snapshot
+                print(f"Not writing {args.write_snapshot} because the SLA domains are incomplete.")
             else:
-                print(f"{schedule_type.capitalize()} Schedule: Not configured")
-        print("\n")
+                write_snapshot_file(args.write_snapshot, SlaScheduleIndex([sladomain['node'] for sladomain in sladomains]))
+                print(f"SLA snapshot file written to {args.write_snapshot}.")
+        if filters:
+            index = SlaScheduleIndex([sladomain['node'] for sladomain in sladomains])
+            sladomains = [sladomains[row] for row in index.filter(filters)]
+            print(f"SLA domains matching {' and '.join(filters)}: {len(sladomains)}")
+        if args.footprint:
+            index = SlaScheduleIndex([sladomain['node'] for sladomain in sladomains])
+            footprint = index.retention_footprint()
+            columns = [f"{tier}.retained_snapshots" for tier in TIERS] + ["total_retained_snapshots", "retention_horizon_days"]
+            with open(args.footprint, "w", newline='') as footprint_file:
+                writer = csv.writer(footprint_file)
+                writer.writerow(["id", "name"] + columns)
+                for row in range(len(index)):
+                    writer.writerow([index.ids[row], index.names[row]] + [footprint[column][row] for column in columns])
+            print(f"Retention footprint written to {args.footprint}: {footprint['total_retained_snapshots'].sum()} retained snapshots across {len(index)} SLA domains.")
+        for sladomain in sladomains:
+            print_sla_domain(sladomain)
+
+    # Clean up the session
+    if client:
+        client._delete_session()
+
+    if deadline_exceeded:
+        exit(2)
 
     if not sladomains:
         print("No SLA domains found.")
-        client._delete_session()
         exit(0)
-    
-    # Clean up the session
-    client._delete_session()
-
 
-    print("Cleaning up...")
\ No newline at end of file
+    print("Cleaning up...")
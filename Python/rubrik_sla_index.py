@@ -0,0 +1,145 @@
+import operator
+import re
+from typing import List
+
+import numpy as np
+
+# The snapshot schedule tiers, in the order they appear in the slaDomains query
+TIERS = ["hourly", "daily", "weekly", "monthly", "yearly"]
+
+# RSC retention units and their length in days (months, quarters and years use calendar averages)
+RETENTION_UNITS = ["MINUTES", "HOURS", "DAYS", "WEEKS", "MONTHS", "QUARTERS", "YEARS"]
+RETENTION_UNIT_DAYS = np.array([1 / 1440, 1 / 24, 1, 7, 365.25 / 12, 365.25 / 4, 365.25])
+
+# Length in days of one frequency step of every tier, in the order of TIERS
+TIER_PERIOD_DAYS = np.array([1 / 24, 1, 7, 365.25 / 12, 365.25])
+
+# Columns stored for every tier, queried as '<tier>.<field>'
+FIELDS = ["frequency", "retention", "retention_unit", "retention_days", "configured"]
+
+OPERATORS = {
+    "<=": operator.le,
+    ">=": operator.ge,
+    "==": operator.eq,
+    "!=": operator.ne,
+    "<": operator.lt,
+    ">": operator.gt
+}
+FILTER_PATTERN = re.compile(r"^\s*(\w+)\.(\w+)\s*(<=|>=|==|!=|<|>)\s*(.+?)\s*$")
+
+
+def parse_filter(expression: str):
+    """
+    Parse a filter expression such as 'daily.retention_days<30' into (tier, field, operator, value),
+    with the value converted to the column's type. Raises ValueError for invalid expressions.
+    """
+    match = FILTER_PATTERN.match(expression)
+    if not match:
+        raise ValueError(f"Invalid filter '{expression}'. Expected '<tier>.<field><op><value>'.")
+    tier, field, op, value = match.groups()
+    if tier not in TIERS or field not in FIELDS:
+        raise ValueError(f"Unknown column '{tier}.{field}'. Tiers: {', '.join(TIERS)}. Fields: {', '.join(FIELDS)}.")
+
+    if field == "configured":
+        if value.lower() not in ["true", "yes", "1", "false", "no", "0"]:
+            raise ValueError(f"Invalid value '{value}' for '{tier}.configured'. Expected true or false.")
+        value = value.lower() in ["true", "yes", "1"]
+    elif field == "retention_unit":
+        if value.upper() not in RETENTION_UNITS:
+            raise ValueError(f"Unknown retention unit '{value}'. Units: {', '.join(RETENTION_UNITS)}.")
+        value = RETENTION_UNITS.index(value.upper())
+    else:
+        try:
+            value = float(value)
+        except ValueError:
+            raise ValueError(f"Invalid number '{value}' in filter '{expression}'.")
+    return tier, field, op, value
+
+
+# A class holding the parsed basicSchedule values of all SLA domains as NumPy columns
+class SlaScheduleIndex:
+    def __init__(self, nodes: list):
+        """
+        Build the columns from SLA domain nodes as returned by Queries.get_sla_domains.
+        Unconfigured tiers have a frequency and retention of 0, a retention_unit of -1
+        and a retention_days of NaN; mask excludes them from every non-'configured' filter.
+        """
+        count = len(nodes)
+        self.ids = np.array([node.get("id") for node in nodes], dtype=object)
+        self.names = np.array([node.get("name") for node in nodes], dtype=object)
+        self.columns = {}
+
+        for tier in TIERS:
+            frequency = np.zeros(count, dtype=np.int32)
+            retention = np.zeros(count, dtype=np.int32)
+            unit = np.full(count, -1, dtype=np.int8)
+            for row, node in enumerate(nodes):
+                schedule = (node.get("snapshotSchedule") or {}).get(tier) or {}
+                basic_schedule = schedule.get("basicSchedule")
+                if basic_schedule:
+                    frequency[row] = basic_schedule.get("frequency") or 0
+                    retention[row] = basic_schedule.get("retention") or 0
+                    if basic_schedule.get("retentionUnit") in RETENTION_UNITS:
+                        unit[row] = RETENTION_UNITS.index(basic_schedule["retentionUnit"])
+
+            configured = unit >= 0
+            retention_days = np.full(count, np.nan)
+            retention_days[configured] = retention[configured] * RETENTION_UNIT_DAYS[unit[configured]]
+
+            self.columns[f"{tier}.frequency"] = frequency
+            self.columns[f"{tier}.retention"] = retention
+            self.columns[f"{tier}.retention_unit"] = unit
+            self.columns[f"{tier}.retention_days"] = retention_days
+            self.columns[f"{tier}.configured"] = configured
+
+    def __len__(self):
+        return len(self.ids)
+
+    def mask(self, expression: str):
+        """
+        Return a boolean mask for a single filter expression such as 'daily.retention_days<30',
+        'yearly.configured==false' or 'monthly.retention_unit==MONTHS'. Apart from 'configured',
+        a filter never matches an SLA domain whose tier is not configured, whatever the operator.
+        """
+        tier, field, op, value = parse_filter(expression)
+        matches = OPERATORS[op](self.columns[f"{tier}.{field}"], value)
+        if field == "configured":
+            return matches
+        return matches & self.columns[f"{tier}.configured"]
+
+    def filter(self, expressions: List[str]):
+        """Return the row numbers matching all filter expressions."""
+        combined = np.ones(len(self), dtype=bool)
+        for expression in expressions:
+            combined &= self.mask(expression)
+        return np.flatnonzero(combined)
+
+    def query(self, expressions: List[str]):
+        """Return (id, name) pairs of the SLA domains matching all filter expressions."""
+        rows = self.filter(expressions)
+        return list(zip(self.ids[rows], self.names[rows]))
+
+    def retention_footprint(self):
+        """
+        Compute the steady-state retention footprint of every SLA domain in one pass.
+
+        For every tier the number of retained snapshots is the retention divided by the
+        snapshot interval (frequency times the tier period), rounded down. The retention
+        horizon is the longest retention over all configured tiers, in days.
+        Returns a dict of arrays keyed '<tier>.retained_snapshots', 'total_retained_snapshots'
+        and 'retention_horizon_days'.
+        """
+        frequency = np.stack([self.columns[f"{tier}.frequency"] for tier in TIERS], axis=1)
+        retention_days = np.stack([self.columns[f"{tier}.retention_days"] for tier in TIERS], axis=1)
+        configured = ~np.isnan(retention_days)
+        usable = configured & (frequency > 0)
+
+        interval_days = np.where(usable, frequency, 1) * TIER_PERIOD_DAYS
+        # The small epsilon keeps exact multiples such as 24 HOURS / 4 hours from rounding down to 5
+        retained = np.where(usable, np.floor(np.where(usable, retention_days, 0) / interval_days + 1e-9), 0).astype(np.int64)
+        horizon = np.where(configured, retention_days, 0).max(axis=1, initial=0)
+
+        footprint = {f"{tier}.retained_snapshots": retained[:, column] for column, tier in enumerate(TIERS)}
+        footprint["total_retained_snapshots"] = retained.sum(axis=1)
+        footprint["retention_horizon_days"] = horizon
+        return footprint
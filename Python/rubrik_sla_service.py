@@ -0,0 +1,184 @@
+import json
+import os
+import socketserver
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse, parse_qs
+
+from rubrik_sla_index import SlaScheduleIndex
+
+
+# An immutable, pre-encoded view of one SLA domain refresh
+class SlaSnapshot:
+    def __init__(self, nodes: list, previous=None):
+        """
+        Index the SLA domain nodes by id and name and pre-encode every response body, so
+        lookups never serialise JSON. Nodes that did not change since the previous snapshot
+        reuse their encoded body.
+        """
+        previous_nodes = previous.nodes_by_id if previous else {}
+        previous_bodies = previous.bodies_by_id if previous else {}
+        self.nodes_by_id = {}
+        self.bodies_by_id = {}
+        self.ids_by_name = {}
+        self.reused = 0
+        for node in nodes:
+            sla_id = node.get("id")
+            if previous_nodes.get(sla_id) == node:
+                body = previous_bodies[sla_id]
+                self.reused += 1
+            else:
+                body = json.dumps(node).encode()
+            self.nodes_by_id[sla_id] = node
+            self.bodies_by_id[sla_id] = body
+            self.ids_by_name.setdefault(node.get("name", "").lower(), []).append(sla_id)
+        self.dump_body = b"[" + b",".join(self.bodies_by_id.values()) + b"]"
+        self.index = SlaScheduleIndex(list(self.nodes_by_id.values()))
+        self.refreshed_at = time.time()
+        self.generation = previous.generation + 1 if previous else 1
+
+
+# A class holding the current SLA snapshot and refreshing it in the background
+class SlaStore:
+    def __init__(self, client, refresh_interval: int = 900, refresh_deadline: float = None):
+        self.client = client
+        self.refresh_interval = refresh_interval
+        self.refresh_deadline = refresh_deadline
+        self.snapshot = None
+        self.last_error = None
+        self._stop = threading.Event()
+        self._thread = None
+
+    def refresh(self):
+        """
+        Fetch all SLA domains and swap in a new snapshot. Readers keep using the previous
+        snapshot until the single reference assignment below, so they never see a partial set.
+        """
+        self.client.reset_deadline(self.refresh_deadline)
+        try:
+            sladomains = self.client._get_sla_domains()
+        except Exception as e:
+            # Only an expired or revoked access token is retried; any other failure, including an
+            # exceeded deadline, keeps the old snapshot. The retry shares the refresh's deadline.
+            if getattr(e, "status_code", None) not in [401, 403]:
+                raise
+            try:
+                self.client._delete_session()
+            except Exception as delete_error:
+                print(f"Could not delete the expired session: {delete_error}")
+            self.client._authenticate()
+            sladomains = self.client._get_sla_domains()
+        snapshot = SlaSnapshot([sladomain["node"] for sladomain in sladomains], previous=self.snapshot)
+        self.snapshot = snapshot
+        print(f"SLA snapshot {snapshot.generation} loaded: {len(snapshot.nodes_by_id)} SLA domains ({snapshot.reused} unchanged).")
+
+    def _refresh_loop(self):
+        while not self._stop.wait(self.refresh_interval):
+            try:
+                self.refresh()
+                self.last_error = None
+            except Exception as e:
+                self.last_error = str(e)
+                print(f"SLA refresh failed, keeping snapshot {self.snapshot.generation}: {e}")
+
+    def start(self):
+        """Load the initial snapshot and start the background refresh thread."""
+        self.refresh()
+        self._thread = threading.Thread(target=self._refresh_loop, name="sla-refresh", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        """Stop the background refresh thread."""
+        self._stop.set()
+        if self._thread:
+            self._thread.join()
+
+
+# A class serving lookups from an SlaStore over HTTP
+class SlaRequestHandler(BaseHTTPRequestHandler):
+    store = None
+
+    def do_GET(self):
+        snapshot = self.store.snapshot
+        url = urlparse(self.path)
+        parts = [part for part in url.path.split("/") if part]
+
+        if parts == ["health"]:
+            body = json.dumps({
+                "generation": snapshot.generation,
+                "count": len(snapshot.nodes_by_id),
+                "refreshed_at": snapshot.refreshed_at,
+                "last_error": self.store.last_error,
+                "graphql_calls_sent": self.store.client.graphql_calls_sent,
+                "graphql_calls_coalesced": self.store.client.graphql_calls_coalesced
+            }).encode()
+            self._send(200, body)
+        elif parts == ["slas"]:
+            names = parse_qs(url.query).get("name")
+            if names:
+                ids = snapshot.ids_by_name.get(names[0].lower(), [])
+                self._send(200, b"[" + b",".join(snapshot.bodies_by_id[sla_id] for sla_id in ids) + b"]")
+            else:
+                self._send(200, snapshot.dump_body)
+        elif parts == ["query"]:
+            try:
+                rows = snapshot.index.filter(parse_qs(url.query).get("filter", []))
+            except ValueError as e:
+                self._send(400, json.dumps({"error": str(e)}).encode())
+                return
+            ids = snapshot.index.ids[rows]
+            self._send(200, b"[" + b",".join(snapshot.bodies_by_id[sla_id] for sla_id in ids) + b"]")
+        elif len(parts) == 2 and parts[0] == "slas":
+            body = snapshot.bodies_by_id.get(parts[1])
+            if body is None:
+                self._send(404, json.dumps({"error": f"SLA domain {parts[1]} not found"}).encode())
+            else:
+                self._send(200, body)
+        else:
+            self._send(404, json.dumps({"error": f"Unknown path {url.path}"}).encode())
+
+    def _send(self, status: int, body: bytes):
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        # Keep the service quiet; lookups are far too frequent to log individually
+        pass
+
+
+class ThreadingUnixHTTPServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    daemon_threads = True
+
+
+def serve_sla_store(store: SlaStore, listen: str = "127.0.0.1:8080", unix_socket: str = None):
+    """
+    Serve the SLA store until interrupted. Endpoints:
+        GET /slas               all SLA domains
+        GET /slas?name=<name>   SLA domains with the given name (case-insensitive)
+        GET /slas/<id>          a single SLA domain
+        GET /query?filter=<f>   SLA domains matching all filters, e.g. filter=daily.retention_days<30
+        GET /health             snapshot generation, size, last refresh error and GraphQL call counters
+    """
+    handler = type("BoundSlaRequestHandler", (SlaRequestHandler,), {"store": store})
+    if unix_socket:
+        if os.path.exists(unix_socket):
+            os.remove(unix_socket)
+        server = ThreadingUnixHTTPServer(unix_socket, handler)
+        print(f"Serving SLA domains on unix socket {unix_socket}...")
+    else:
+        host, port = listen.rsplit(":", 1)
+        server = ThreadingHTTPServer((host, int(port)), handler)
+        print(f"Serving SLA domains on http://{host}:{port}...")
+
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        print("Stopping SLA service...")
+    finally:
+        server.server_close()
+        if unix_socket and os.path.exists(unix_socket):
+            os.remove(unix_socket)
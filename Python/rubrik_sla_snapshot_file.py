@@ -0,0 +1,160 @@
+import mmap
+import os
+import struct
+import tempfile
+
+import numpy as np
+
+from rubrik_sla_index import SlaScheduleIndex, TIERS, RETENTION_UNITS
+
+# File layout (little-endian):
+#   header            MAGIC, version (uint16), reserved (uint16), row count (uint32), column count (uint32)
+#   column directory  one entry per column: name (32 bytes), NumPy dtype (8 bytes), offset (uint64), size (uint64)
+#   column data       every column starts on an 8-byte boundary
+# Numeric columns hold one fixed-width value per SLA domain. The 'id' and 'name' string columns are
+# stored as a string table: '<column>.offsets' (uint32, row count + 1) into '<column>.data' (UTF-8 bytes).
+# 'id.sorted_rows' (uint32) lists the rows ordered by their UTF-8 id, so an id is found by binary search.
+MAGIC = b"RSLA"
+VERSION = 2
+HEADER = struct.Struct("<4sHHII")
+DIRECTORY_ENTRY = struct.Struct("<32s8sQQ")
+STRING_COLUMNS = ["id", "name"]
+
+# The process umask can only be read by setting it, so look it up once at import instead of while
+# other threads may be creating files
+UMASK = os.umask(0)
+os.umask(UMASK)
+
+
+def _string_table(values):
+    """Encode a list of strings as (offsets, data) arrays."""
+    encoded = [(value or "").encode() for value in values]
+    offsets = np.zeros(len(encoded) + 1, dtype="<u4")
+    offsets[1:] = np.cumsum([len(value) for value in encoded], dtype=np.uint64)
+    return offsets, np.frombuffer(b"".join(encoded), dtype="u1")
+
+
+def write_snapshot_file(path: str, index: SlaScheduleIndex):
+    """
+    Write the schedule index to a columnar snapshot file. The file is written next to its
+    destination and renamed into place, so readers always open a complete version. Like a
+    newly created file, it is readable by other users unless the umask prevents it.
+    """
+    columns = {}
+    for column in STRING_COLUMNS:
+        values = index.ids if column == "id" else index.names
+        columns[f"{column}.offsets"], columns[f"{column}.data"] = _string_table(values)
+    encoded_ids = [(sla_id or "").encode() for sla_id in index.ids]
+    columns["id.sorted_rows"] = np.array(sorted(range(len(encoded_ids)), key=encoded_ids.__getitem__), dtype="<u4")
+    for name, values in index.columns.items():
+        columns[name] = values.astype(values.dtype.newbyteorder("<"))
+
+    directory = []
+    offset = HEADER.size + DIRECTORY_ENTRY.size * len(columns)
+    for name, values in columns.items():
+        offset += -offset % 8
+        directory.append((name, values, offset))
+        offset += values.nbytes
+
+    descriptor, temp_path = tempfile.mkstemp(dir=os.path.dirname(os.path.abspath(path)), prefix=".sla_snapshot_")
+    try:
+        with os.fdopen(descriptor, "wb") as snapshot_file:
+            snapshot_file.write(HEADER.pack(MAGIC, VERSION, 0, len(index), len(columns)))
+            for name, values, offset in directory:
+                snapshot_file.write(DIRECTORY_ENTRY.pack(name.encode(), values.dtype.str.encode(), offset, values.nbytes))
+            for name, values, offset in directory:
+                snapshot_file.write(b"\0" * (offset - snapshot_file.tell()))
+                snapshot_file.write(values.tobytes())
+            snapshot_file.flush()
+            os.fsync(snapshot_file.fileno())
+        # mkstemp creates the file readable by its owner only, so apply the usual mode first
+        os.chmod(temp_path, 0o644 & ~UMASK)
+        os.replace(temp_path, path)
+    except BaseException:
+        os.remove(temp_path)
+        raise
+
+
+# A class giving zero-copy, random access to a snapshot file through mmap
+class SlaSnapshotFile:
+    def __init__(self, path: str):
+        with open(path, "rb") as snapshot_file:
+            self._mmap = mmap.mmap(snapshot_file.fileno(), 0, access=mmap.ACCESS_READ)
+        self.columns = {}
+        try:
+            magic, version, _, self.row_count, column_count = HEADER.unpack_from(self._mmap, 0)
+            if magic != MAGIC or version != VERSION:
+                raise Exception(f"{path} is not a version {VERSION} SLA snapshot file.")
+
+            # Every column is a read-only NumPy view on the mapped file; nothing is copied
+            for entry in range(column_count):
+                name, dtype, offset, size = DIRECTORY_ENTRY.unpack_from(self._mmap, HEADER.size + entry * DIRECTORY_ENTRY.size)
+                dtype = np.dtype(dtype.rstrip(b"\0").decode())
+                self.columns[name.rstrip(b"\0").decode()] = np.frombuffer(self._mmap, dtype=dtype, count=size // dtype.itemsize, offset=offset)
+        except BaseException:
+            # A truncated or corrupt file must not leave the mapping open
+            self.close()
+            raise
+
+    def __len__(self):
+        return self.row_count
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def close(self):
+        """Release the column views and unmap the file."""
+        self.columns = {}
+        try:
+            self._mmap.close()
+        except BufferError:
+            # A caller still holds a column view; the mapping is released once that view is gone
+            pass
+
+    def string(self, column: str, row: int):
+        """Return the value of a string column ('id' or 'name') for a row."""
+        offsets = self.columns[f"{column}.offsets"]
+        return self.columns[f"{column}.data"][offsets[row]:offsets[row + 1]].tobytes().decode()
+
+    def find(self, sla_id: str):
+        """
+        Return the row of an SLA domain id, or None if it is not in the file. Binary searches
+        'id.sorted_rows', reading only the ids it compares from the mapped file.
+        """
+        key = sla_id.encode()
+        offsets = self.columns["id.offsets"]
+        data = self.columns["id.data"]
+        sorted_rows = self.columns["id.sorted_rows"]
+        low, high = 0, self.row_count
+        while low < high:
+            middle = (low + high) // 2
+            row = sorted_rows[middle]
+            candidate = data[offsets[row]:offsets[row + 1]].tobytes()
+            if candidate == key:
+                return int(row)
+            if candidate < key:
+                low = middle + 1
+            else:
+                high = middle
+        return None
+
+    def node(self, row: int):
+        """Rebuild the SLA domain node of a row in the shape returned by Queries.get_sla_domains."""
+        snapshot_schedule = {}
+        for tier in TIERS:
+            unit = self.columns[f"{tier}.retention_unit"][row]
+            snapshot_schedule[tier] = None if unit < 0 else {
+                "basicSchedule": {
+                    "frequency": int(self.columns[f"{tier}.frequency"][row]),
+                    "retention": int(self.columns[f"{tier}.retention"][row]),
+                    "retentionUnit": RETENTION_UNITS[unit]
+                }
+            }
+        return {
+            "name": self.string("name", row),
+            "id": self.string("id", row),
+            "snapshotSchedule": snapshot_schedule
+        }